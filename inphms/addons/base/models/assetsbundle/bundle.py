@@ -29,7 +29,8 @@ class AssetsBundle(object):
     def __init__(self, name, files, external_assets=(), env=None, css=True, js=True, debug_assets=False, rtl=False, assets_params=None, autoprefix=False):
         """
         :param name: bundle name
-        :param files: files to be added to the bundle
+        :param files: ``(url, filename, last_modified)`` of the files to be
+            added to the bundle
         :param css: if css is True, the stylesheets files are added to the bundle
         :param js: if js is True, the javascript files are added to the bundle
         """
@@ -54,13 +55,12 @@ class AssetsBundle(object):
         ]
 
         # asset-wide html "media" attribute
-        for f in files:
-            extension = f['url'].rpartition('.')[2]
+        for url, filename, last_modified in files:
+            extension = url.rpartition('.')[2]
             params = {
-                'url': f['url'],
-                'filename': f['filename'],
-                'inline': f['content'],
-                'last_modified': None if self.is_debug_assets else f.get('last_modified'),
+                'url': url,
+                'filename': filename,
+                'last_modified': None if self.is_debug_assets else last_modified,
             }
             if css:
                 css_params = {
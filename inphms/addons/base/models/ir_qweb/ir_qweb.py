@@ -1,4 +1,5 @@
 from __future__ import annotations
+import ast
 import threading
 import base64
 import traceback
@@ -26,12 +27,13 @@ from dateutil.relativedelta import relativedelta
 from collections.abc import Mapping, Sized
 
 from inphms.orm import models, api
-from inphms.tools._vendor.safe_eval import _BUILTINS, assert_valid_codeobj
-from .utils import T_CALL_SLOT, _logger, unsafe_eval, indent_code, TO_VARNAME_REGEXP, \
+from inphms.databases import SQL
+from inphms.tools._vendor.safe_eval import _BUILTINS
+from .utils import T_CALL_SLOT, _logger, unsafe_eval, escape_str, indent_code, link_to_node, TO_VARNAME_REGEXP, \
     ETREE_TEMPLATE_REF, FIRST_RSTRIP_REGEXP, _id_or_xmlid, request, keep_query, \
-        VOID_ELEMENTS, RSTRIP_REGEXP, FORMAT_REGEX, _SAFE_QWEB_OPCODES, ALLOWED_KEYWORD, \
-        SPECIAL_DIRECTIVES, VARNAME_REGEXP, LSTRIP_REGEXP, SUPPORTED_DEBUGGER, EXTERNAL_ASSET, \
-            SCRIPT_EXTENSIONS, TEMPLATE_EXTENSIONS, STYLE_EXTENSIONS, MALICIOUS_SCHEMES
+        VOID_ELEMENTS, RSTRIP_REGEXP, FORMAT_REGEX, assert_valid_qweb_codeobj, ALLOWED_KEYWORD, \
+        SPECIAL_DIRECTIVES, T_SET_VALUE_DIRECTIVES, VARNAME_REGEXP, LSTRIP_REGEXP, SUPPORTED_DEBUGGER, EXTERNAL_ASSET, \
+            MALICIOUS_SCHEMES, CALL_ASSETS_XPATH, ESCAPED_ASSET_ATTRS
 from .content import QwebContent
 from .callparams import QwebCallParameters
 from .frame import QwebStackFrame
@@ -40,7 +42,7 @@ from .json import qwebJSON
 from inphms.exceptions import UserError, MissingError
 from inphms import tools
 from inphms.config import config
-from inphms.tools import file_path, file_open, frozendict, OrderedSet, str2bool
+from inphms.tools import LRU, file_path, file_open, frozendict, OrderedSet, str2bool
 from inphms.modules import Manifest
 from inphms.tools.profiler import QwebTracker, ExecutionContext
 from inphms.tools.imageutils import image_data_uri, FILETYPE_BASE64_MAGICWORD
@@ -51,6 +53,12 @@ safe_eval = importlib.import_module("inphms.tools._vendor.safe_eval")
 if typing.TYPE_CHECKING:
     from collections.abc import Iterator, Sequence
 
+# The compiled expressions only depend on the source expression and on the
+# class of the compiler (the compilation methods may be overridden), they are
+# shared between all the compilations.
+_COMPILED_EXPRESSIONS = LRU(4096)
+_COMPILED_FORMATS = LRU(4096)
+
 
 class IrQweb(models.AbstractModel):
     """ Base QWeb rendering engine
@@ -370,9 +378,13 @@ class IrQweb(models.AbstractModel):
 
             return {'not_found_template': not_found_template}, 'not_found_template', frozendict(options)
 
+        # The generated code starts at column 0 and holds no multi-line string
+        # literals, it is nested into the wrapper function line by line (no
+        # need to dedent and re-indent the whole module). Like `indent_code`,
+        # blank lines are emptied and not indented.
         wrap_code = '\n'.join([
             "def generate_functions():",
-            indent_code(code, 1),
+            *(f"    {line}" if line.strip() else '' for line in code.strip().split('\n')),
             f"    code = {code!r}",
             "    return template_functions",
         ])
@@ -455,12 +467,12 @@ class IrQweb(models.AbstractModel):
         # generate code
         ref_name = compile_context['ref_name'] or ''
         if isinstance(template, etree._Element):
-            def_name = TO_VARNAME_REGEXP.sub(r'_', f'template_etree_{next(ETREE_TEMPLATE_REF)}')
+            def_name = f'template_etree_{next(ETREE_TEMPLATE_REF)}'
         else:
             def_name = TO_VARNAME_REGEXP.sub(r'_', f'template_{ref_name if "<" not in ref_name else ""}_{ref}')
 
-        name_gen = count()
-        compile_context['make_name'] = lambda prefix: f"{def_name}_{prefix}_{next(name_gen)}"
+        next_name_index = count().__next__
+        compile_context['make_name'] = lambda prefix: f"{def_name}_{prefix}_{next_name_index()}"
 
         if element.text:
             element.text = FIRST_RSTRIP_REGEXP.sub(r'\2', element.text)
@@ -685,6 +697,7 @@ class IrQweb(models.AbstractModel):
             'Mapping': Mapping,
             'Markup': Markup,
             'escape': escape,
+            'escape_str': escape_str,
             'VOID_ELEMENTS': VOID_ELEMENTS,
             'QwebCallParameters': QwebCallParameters,
             'QwebContent': QwebContent,
@@ -753,6 +766,11 @@ class IrQweb(models.AbstractModel):
         # <t t-setf-name="Hello #{world} %s !"/>
         # =>
         # values['name'] = 'Hello %s %%s !' % (values['world'],)
+        key = (type(self), expr)
+        try:
+            return _COMPILED_FORMATS[key]
+        except KeyError:
+            pass
         values = [
             f'self._compile_to_str({self._compile_expr(m.group(1) or m.group(2))})'
             for m in FORMAT_REGEX.finditer(expr)
@@ -760,6 +778,7 @@ class IrQweb(models.AbstractModel):
         code = repr(FORMAT_REGEX.sub('%s', expr.replace('%', '%%')))
         if values:
             code += f' % ({", ".join(values)},)'
+        _COMPILED_FORMATS[key] = code
         return code
 
     def _compile_expr_tokens(self, tokens, allowed_keys, argument_names=None, raise_on_missing=False):
@@ -933,6 +952,12 @@ class IrQweb(models.AbstractModel):
             'product' value and not an 'NoneType' object has no attribute
             'price' error.
         """
+        key = (type(self), expr, raise_on_missing)
+        try:
+            return _COMPILED_EXPRESSIONS[key]
+        except KeyError:
+            pass
+
         # Parentheses are useful for compiling multi-line expressions such as
         # conditions existing in some templates. (see test_compile_expr tests)
         readable = io.BytesIO(f"({expr or ''})".encode('utf-8'))
@@ -943,9 +968,10 @@ class IrQweb(models.AbstractModel):
 
         expression = self._compile_expr_tokens(tokens, ALLOWED_KEYWORD, raise_on_missing=raise_on_missing)
 
-        assert_valid_codeobj(_SAFE_QWEB_OPCODES, compile(expression, '<>', 'eval'), expr)
+        assert_valid_qweb_codeobj(compile(expression, '<>', 'eval'), expr)
 
-        return f"({expression})"
+        code = _COMPILED_EXPRESSIONS[key] = f"({expression})"
+        return code
 
     def _compile_bool(self, attr, default=False):
         """Convert the statements as a boolean."""
@@ -1355,7 +1381,7 @@ class IrQweb(models.AbstractModel):
                 attrs = self._post_processing_att(tagName, attrs)
                 for name, value in attrs.items():
                     if value or isinstance(value, str):
-                        yield f' {{escape(str(name))}}="{{escape(str(value))}}"'
+                        yield f' {{escape_str(str(name))}}="{{escape_str(str(value))}}"'
         """, level))
 
         # close the open tag
@@ -1399,20 +1425,20 @@ class IrQweb(models.AbstractModel):
             if '__' in varname:
                 raise SyntaxError(f"Using variable names with '__' is not allowed: {varname!r}")
 
-            if 't-value' in el.attrib or 't-valuef' in el.attrib or 't-valuef.translate' in el.attrib or varname[0] == '{':
-                el.attrib.pop('t-inner-content') # The content is considered empty.
+            attrib = el.attrib
+            value_directive = next((key for key in T_SET_VALUE_DIRECTIVES if key in attrib), None)
+
+            if value_directive or varname[0] == '{':
+                attrib.pop('t-inner-content') # The content is considered empty.
                 if varname == T_CALL_SLOT:
                     raise SyntaxError('t-set="0" should not be set from t-value or t-valuef')
 
-            if 't-value' in el.attrib:
-                expr = el.attrib.pop('t-value') or 'None'
-                code.append(indent_code(f"values[{varname!r}] = {self._compile_expr(expr)}", level))
-            elif 't-valuef' in el.attrib:
-                exprf = el.attrib.pop('t-valuef')
-                code.append(indent_code(f"values[{varname!r}] = {self._compile_format(exprf)}", level))
-            elif 't-valuef.translate' in el.attrib:
-                exprf = el.attrib.pop('t-valuef.translate')
-                code.append(indent_code(f"values[{varname!r}] = {self._compile_format(exprf)}", level))
+            if value_directive:
+                expr = attrib.pop(value_directive)
+                if value_directive == 't-value':
+                    expr = expr or 'None'
+                compile_value = getattr(self, T_SET_VALUE_DIRECTIVES[value_directive])
+                code.append(indent_code(f"values[{varname!r}] = {compile_value(expr)}", level))
             elif varname[0] == '{':
                 code.append(indent_code(f"values.update({self._compile_expr(varname)})", level))
             else:
@@ -1635,15 +1661,33 @@ class IrQweb(models.AbstractModel):
 
         t_foreach = compile_context['make_name']('t_foreach')
         size = compile_context['make_name']('size')
-        has_value = compile_context['make_name']('has_value')
+        has_value_name = compile_context['make_name']('has_value')
+
+        # When the kind of container is known at compile time (number or
+        # literal), only generate the code needed for this container.
+        # `has_value` and `is_sized` are None when only known at rendering.
+        try:
+            foreach_node = ast.parse(expr_foreach.strip(), mode='eval').body
+        except SyntaxError:
+            foreach_node = None  # `_compile_expr` raises a clearer error
 
         if expr_foreach.isdigit():
+            has_value, is_sized = False, True
             code.append(indent_code(f"""
                 values[{expr_as + '_size'!r}] = {size} = {int(expr_foreach)}
                 {t_foreach} = range({size})
-                {has_value} = False
             """, level))
+        elif isinstance(foreach_node, (ast.List, ast.Tuple, ast.ListComp, ast.Dict, ast.DictComp)):
+            has_value = isinstance(foreach_node, (ast.Dict, ast.DictComp))
+            is_sized = True
+            code.append(indent_code(f"""
+                {t_foreach} = {self._compile_expr(expr_foreach)}
+                values[{expr_as + '_size'!r}] = {size} = len({t_foreach})
+            """, level))
+            if has_value:
+                code.append(indent_code(f"{t_foreach} = {t_foreach}.items()", level))
         else:
+            has_value = is_sized = None
             code.append(indent_code(f"""
                 {t_foreach} = {self._compile_expr(expr_foreach)} or []
                 if isinstance({t_foreach}, Sized):
@@ -1653,26 +1697,43 @@ class IrQweb(models.AbstractModel):
                     {t_foreach} = range({size})
                 else:
                     {size} = None
-                {has_value} = False
+                {has_value_name} = False
                 if isinstance({t_foreach}, Mapping):
                     {t_foreach} = {t_foreach}.items()
-                    {has_value} = True
+                    {has_value_name} = True
             """, level))
 
         code.append(indent_code(f"""
                 for index, item in enumerate({t_foreach}):
                     values[{expr_as + '_index'!r}] = index
-                    if {has_value}:
-                        values[{expr_as!r}], values[{expr_as + '_value'!r}] = item
-                    else:
-                        values[{expr_as!r}] = values[{expr_as + '_value'!r}] = item
-                    values[{expr_as + '_first'!r}] = values[{expr_as + '_index'!r}] == 0
-                    if {size} is not None:
-                        values[{expr_as + '_last'!r}] = index + 1 == {size}
-                    values[{expr_as + '_odd'!r}] = index % 2
-                    values[{expr_as + '_even'!r}] = not values[{expr_as + '_odd'!r}]
-                    values[{expr_as + '_parity'!r}] = 'odd' if values[{expr_as + '_odd'!r}] else 'even'
             """, level))
+        if has_value is None:
+            code.append(indent_code(f"""
+                if {has_value_name}:
+                    values[{expr_as!r}], values[{expr_as + '_value'!r}] = item
+                else:
+                    values[{expr_as!r}] = values[{expr_as + '_value'!r}] = item
+            """, level + 1))
+        elif has_value:
+            code.append(indent_code(f"values[{expr_as!r}], values[{expr_as + '_value'!r}] = item", level + 1))
+        else:
+            code.append(indent_code(f"values[{expr_as!r}] = values[{expr_as + '_value'!r}] = item", level + 1))
+        code.append(indent_code(f"values[{expr_as + '_first'!r}] = index == 0", level + 1))
+        if is_sized is None:
+            code.append(indent_code(f"""
+                if {size} is not None:
+                    values[{expr_as + '_last'!r}] = index + 1 == {size}
+            """, level + 1))
+        else:
+            code.append(indent_code(f"values[{expr_as + '_last'!r}] = index + 1 == {size}", level + 1))
+        # the loop variables are computed from locals instead of being read
+        # back from `values`
+        code.append(indent_code(f"""
+                odd = index % 2
+                values[{expr_as + '_odd'!r}] = odd
+                values[{expr_as + '_even'!r}] = not odd
+                values[{expr_as + '_parity'!r}] = 'odd' if odd else 'even'
+            """, level + 1))
 
         code.extend(content_foreach or indent_code('continue', level + 1))
 
@@ -1795,15 +1856,23 @@ class IrQweb(models.AbstractModel):
         # Use str to avoid the escaping of the other html content because the
         # yield generator MarkupSafe values will be join into an string in
         # `_render`.
-        code.append(indent_code(f"""
-            if isinstance(content, QwebContent):
-                self.env.context['_qweb_error_path_xml'][0] = template_options['ref']
-                self.env.context['_qweb_error_path_xml'][1] = {path!r}
-                self.env.context['_qweb_error_path_xml'][2] = {xml!r}
-                yield content
-            else:
-                yield str(escape(content))
-        """, level + 1))
+        # A plain `str` is escaped without the Markup wrapper (`escape_str`).
+        if force_display_dependent or ttype == 't-raw':
+            # the content is already converted into a string (or Markup) by
+            # the code above, it can't be a QwebContent
+            code.append(indent_code("yield escape_str(content) if content.__class__ is str else str(escape(content))", level + 1))
+        else:
+            code.append(indent_code(f"""
+                if isinstance(content, QwebContent):
+                    self.env.context['_qweb_error_path_xml'][0] = template_options['ref']
+                    self.env.context['_qweb_error_path_xml'][1] = {path!r}
+                    self.env.context['_qweb_error_path_xml'][2] = {xml!r}
+                    yield content
+                elif content.__class__ is str:
+                    yield escape_str(content)
+                else:
+                    yield str(escape(content))
+            """, level + 1))
         code.extend(tag_close)
 
         # generate code to display the tag with default content if the value is
@@ -1919,11 +1988,21 @@ class IrQweb(models.AbstractModel):
         # values from content (t-out="0")
         if bool(list(el) or el.text):
             is_deprecated_version = not any(not key.startswith('t-') for key in el.attrib) and any(n.attrib.get('t-set') for n in el)
+            body = self._compile_directive(el, compile_context, 'inner-content', 1)
+        else:
+            body = None
 
+        if body == [] and not is_deprecated_version:
+            # The content is purely static: use its text directly instead of
+            # a function rendering it into a QwebContent.
+            static_content = ''.join(compile_context['_text_concat'])
+            compile_context['_text_concat'].clear()
+            code.append(indent_code(f"t_call_values = {{ {T_CALL_SLOT}: Markup({static_content!r}) }}", level))
+        elif body is not None:
             def_name = compile_context['make_name']('t_call')
             code_content = [f"def {def_name}(self, values):"]
             code_content.append(indent_code(f'# element: {path!r} , {xml!r}', 1))
-            code_content.extend(self._compile_directive(el, compile_context, 'inner-content', 1))
+            code_content.extend(body)
             self._append_text('', compile_context)  # To ensure the template function is a generator and doesn't become a regular function
             code_content.extend(self._flush_text(compile_context, 1, rstrip=True))
 
@@ -2015,26 +2094,10 @@ class IrQweb(models.AbstractModel):
             )
         """.strip(), level))
 
+        # one yield for all the nodes
         code.append(indent_code("""
-            for index, (tagName, asset_attrs) in enumerate(t_call_assets_nodes):
-                if index:
-                    yield '\\n        '
-                yield '<'
-                yield tagName
-
-                attrs = self._post_processing_att(tagName, asset_attrs)
-                for name, value in attrs.items():
-                    if value or isinstance(value, str):
-                        yield f' {escape(str(name))}="{escape(str(value))}"'
-
-                if tagName in VOID_ELEMENTS:
-                    yield '/>'
-                else:
-                    yield '>'
-                    yield '</'
-                    yield tagName
-                    yield '>'
-                """, level))
+            yield '\\n        '.join(self._build_asset_tag(tagName, attrs) for tagName, attrs in t_call_assets_nodes)
+        """, level))
 
         return code
 
@@ -2066,10 +2129,27 @@ class IrQweb(models.AbstractModel):
 
             @returns dict
         """
-        if not atts.pop('__is_static_node', False) and (href := atts.get('href')) and MALICIOUS_SCHEMES(str(href)):
-            atts['href'] = ""
+        if not atts.pop('__is_static_node', False) and (href := atts.get('href')):
+            href = str(href)
+            # a scheme needs a colon: skip the regex for the relative urls
+            if ':' in href and MALICIOUS_SCHEMES(href):
+                atts['href'] = ""
         return atts
 
+    def _build_asset_tag(self, tagName, attrs):
+        """ Method called at running time to render the html of a node given
+            by ``_get_asset_nodes``.
+        """
+        attrs = self._post_processing_att(tagName, attrs)
+        attrs = ''.join(
+            f' {ESCAPED_ASSET_ATTRS.get(name) or escape_str(str(name))}="{escape_str(str(value))}"'
+            for name, value in attrs.items()
+            if value or isinstance(value, str)
+        )
+        if tagName in VOID_ELEMENTS:
+            return f'<{tagName}{attrs}/>'
+        return f'<{tagName}{attrs}></{tagName}>'
+
     def _get_field(self, record, field_name, expression, tagName, field_options, values):
         """Method called at compile time to return the field value.
 
@@ -2142,7 +2222,7 @@ class IrQweb(models.AbstractModel):
         If debug=assets, the assets will be regenerated when a file which composes them has been modified.
         Else, the assets will be generated only once and then stored in cache.
         """
-        rtl = self.env['res.lang'].sudo()._get_data(code=(self.env.lang or self.env.user.lang)).direction == 'rtl'
+        rtl = self._is_rtl_lang(self.env.lang or self.env.user.lang)
         assets_params = self.env['ir.asset']._get_asset_params() # website_id
         debug_assets = debug and 'assets' in debug
 
@@ -2152,6 +2232,12 @@ class IrQweb(models.AbstractModel):
             return self._generate_asset_links_cache(bundle, css=css, js=js, assets_params=assets_params, rtl=rtl, autoprefix=autoprefix)
 
     # other methods used for the asset bundles
+    @tools.ormcache('lang', cache='stable')
+    def _is_rtl_lang(self, lang):
+        """ Return whether the given language is written from right to left.
+        Same cache as ``res.lang._get_active_by``, invalidated with it. """
+        return self.env['res.lang'].sudo()._get_data(code=lang).direction == 'rtl'
+
     @tools.conditional(
         # in non-xml-debug mode we want assets to be cached forever, and the admin can force a cache clear
         # by restarting the server after updating the source code (or using the "Clear server cache" in debug tools)
@@ -2162,6 +2248,9 @@ class IrQweb(models.AbstractModel):
         return self._generate_asset_links(bundle, css, js, False, assets_params, rtl, autoprefix=autoprefix)
 
     def _get_asset_content(self, bundle, assets_params=None):
+        """ Return the ``(url, filename, last_modified)`` of the local files
+        of the bundle and the urls of its external assets.
+        """
         if assets_params is None:
             assets_params = self.env['ir.asset']._get_asset_params()  # website_id
         asset_paths = self.env['ir.asset']._get_asset_paths(bundle=bundle, assets_params=assets_params)
@@ -2169,12 +2258,7 @@ class IrQweb(models.AbstractModel):
         external_asset = []
         for path, full_path, _bundle, last_modified in asset_paths:
             if full_path is not EXTERNAL_ASSET:
-                files.append({
-                    'url': path,
-                    'filename': full_path,
-                    'content': '',
-                    'last_modified': last_modified,
-                })
+                files.append((path, full_path, last_modified))
             else:
                 external_asset.append(path)
         return (files, external_asset)
@@ -2189,52 +2273,11 @@ class IrQweb(models.AbstractModel):
         return [self._link_to_node(path, defer_load=defer_load, lazy_load=lazy_load, media=media) for path in paths]
 
     def _link_to_node(self, path, defer_load=False, lazy_load=False, media=None):
-        ext = path.rsplit('.', maxsplit=1)[-1] if path else 'js'
-        is_js = ext in SCRIPT_EXTENSIONS
-        is_xml = ext in TEMPLATE_EXTENSIONS
-        is_css = ext in STYLE_EXTENSIONS
-
-        if is_js:
-            is_asset_bundle = path and path.startswith('/web/assets/')
-            attributes = {
-                'type': 'text/javascript',
-            }
-
-            if defer_load:
-                # Note that "lazy_load" will lead to "defer" being added in JS,
-                # not here, otherwise this is not W3C valid (defer is probably
-                # not even needed there anyways). See LAZY_LOAD_DEFER.
-                attributes['defer'] = 'defer'
-            if path:
-                if lazy_load:
-                    attributes['data-src'] = path
-                else:
-                    attributes['src'] = path
-
-            if is_asset_bundle:
-                attributes['onerror'] = "__inphmsAssetError=1"
-
-            return ('script', attributes)
-
-        if is_css:
-            attributes = {
-                'type': f'text/{ext}',  # we don't really expect to have anything else than pure css here
-                'rel': 'stylesheet',
-                'href': path,
-                'media': media,
-            }
-            return ('link', attributes)
-
-        if is_xml:
-            attributes = {
-                'type': 'text/xml',
-                'async': 'async',
-                'rel': 'prefetch',
-                'data-src': path,
-                }
-            return ('script', attributes)
-
-        return None
+        node = link_to_node(path, defer_load=defer_load, lazy_load=lazy_load, media=media)
+        if node is None:
+            return None
+        # the attributes are modified during the rendering
+        return (node[0], dict(node[1]))
 
     def _generate_asset_links(self, bundle, css=True, js=True, debug_assets=False, assets_params=None, rtl=False, autoprefix=False):
         asset_bundle = self._get_asset_bundle(bundle, css=css, js=js, debug_assets=debug_assets, rtl=rtl, assets_params=assets_params, autoprefix=autoprefix)
@@ -2274,11 +2317,20 @@ class IrQweb(models.AbstractModel):
         Returns the list of bundles to pregenerate.
         """
 
-        views = self.env['ir.ui.view'].search([('type', '=', 'qweb'), ('arch_db', 'like', 't-call-assets')])
+        # Only the archs are needed: read them directly instead of loading the
+        # view records (translations don't alter the t-call-assets nodes).
+        self.env['ir.ui.view'].flush_model(['type', 'active', 'arch_db'])
+        self.env.cr.execute(SQL("""
+            SELECT arch_db->>'en_US'
+              FROM ir_ui_view
+             WHERE type = 'qweb'
+               AND active
+               AND arch_db->>'en_US' LIKE %s
+        """, '%t-call-assets%'))
         js_bundles = set()
         css_bundles = set()
-        for view in views:
-            for call_asset in etree.fromstring(view.arch_db).xpath("//*[@t-call-assets]"):
+        for [arch] in self.env.cr.fetchall():
+            for call_asset in CALL_ASSETS_XPATH(etree.fromstring(arch)):
                 asset = call_asset.get('t-call-assets')
                 js = str2bool(call_asset.get('t-js', 'True'))
                 css = str2bool(call_asset.get('t-css', 'True'))
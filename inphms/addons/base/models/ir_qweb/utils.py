@@ -1,14 +1,21 @@
 from __future__ import annotations
+import dis
 import logging
 import token
 import re
 import fnmatch
+import functools
 import textwrap
 import werkzeug.urls
 
 from itertools import count
+from types import CodeType
+from lxml import etree
+from markupsafe import escape
 
-from inphms.tools._vendor.safe_eval import _EXPR_OPCODES, to_opcodes, _BLACKLIST, _BUILTINS
+from inphms.tools import frozendict
+from inphms.tools._vendor.safe_eval import _EXPR_OPCODES, to_opcodes, _BLACKLIST, _BUILTINS, \
+    assert_no_dunder_name, assert_valid_codeobj
 from inphms.server.utils import request
 
 _logger = logging.getLogger(__name__)
@@ -60,10 +67,40 @@ _SAFE_QWEB_OPCODES = _EXPR_OPCODES.union(to_opcodes([
     'SET_FUNCTION_ATTRIBUTE',
 ])) - _BLACKLIST
 
+# inline cache entries of the bytecode (python >= 3.11), not real instructions
+_CACHE_OPCODE = dis.opmap.get('CACHE')
+
+
+def assert_valid_qweb_codeobj(code_obj, expr):
+    """ Same as ``assert_valid_codeobj(_SAFE_QWEB_OPCODES, code_obj, expr)``,
+    but the opcodes are read directly from the bytecode (one byte out of two)
+    instead of decoding every instruction with ``dis``.
+    """
+    assert_no_dunder_name(code_obj, expr)
+
+    code_codes = set(code_obj.co_code[::2])
+    code_codes.discard(_CACHE_OPCODE)
+    if not _SAFE_QWEB_OPCODES >= code_codes:
+        # raise the detailed error
+        assert_valid_codeobj(_SAFE_QWEB_OPCODES, code_obj, expr)
+
+    for const in code_obj.co_consts:
+        if isinstance(const, CodeType):
+            assert_valid_qweb_codeobj(const, 'lambda')
+
 
 # eval to compile generated string python code into binary code, used in `_compile`
 unsafe_eval = eval
 
+try:
+    # MarkupSafe >= 3.0: `escape` is a python wrapper around this function
+    # which escapes a `str` (and only a `str`) without building a Markup.
+    from markupsafe import _escape_inner as escape_str
+except ImportError:
+    # MarkupSafe < 3.0: `escape` is directly implemented in C.
+    def escape_str(value):
+        return str(escape(value))
+
 SUPPORTED_DEBUGGER = {'pdb', 'ipdb', 'wdb', 'pudb'}
 from ..utils import EXTERNAL_ASSET, SCRIPT_EXTENSIONS, STYLE_EXTENSIONS, TEMPLATE_EXTENSIONS, ASSET_EXTENSIONS
 
@@ -79,8 +116,20 @@ LSTRIP_REGEXP = re.compile(r'^[ \t]*\n')
 FIRST_RSTRIP_REGEXP = re.compile(r'^(\n[ \t]*)+(\n[ \t])')
 VARNAME_REGEXP = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
 TO_VARNAME_REGEXP = re.compile(r'[^A-Za-z0-9_]+')
+# Attribute names of the nodes generated by `t-call-assets`, already escaped.
+ESCAPED_ASSET_ATTRS = {
+    name: escape_str(name)
+    for name in ('type', 'defer', 'src', 'data-src', 'onerror', 'rel', 'href', 'media', 'async')
+}
 # Attribute name used outside the context of the QWeb.
 SPECIAL_DIRECTIVES = {'t-translation', 't-ignore', 't-title'}
+# Value directives of `t-set`, in priority order, with the name of the method
+# used to compile their expression.
+T_SET_VALUE_DIRECTIVES = {
+    't-value': '_compile_expr',
+    't-valuef': '_compile_format',
+    't-valuef.translate': '_compile_format',
+}
 # Name of the variable to insert the content in t-call in the template.
 # The slot will be replaced by the `t-call` tag content of the caller.
 T_CALL_SLOT = '0'
@@ -88,7 +137,11 @@ T_CALL_SLOT = '0'
 ETREE_TEMPLATE_REF = count()
 
 # Only allow a javascript scheme if it is followed by [ ][window.]history.back()
-MALICIOUS_SCHEMES = re.compile(r'javascript:(?!( ?)((window\.)?)history\.back\(\)$)', re.I).findall
+# (`search` stops at the first match, `findall` would scan the whole value)
+MALICIOUS_SCHEMES = re.compile(r'javascript:(?! ?(?:window\.)?history\.back\(\)$)', re.I).search
+
+# Nodes of an arch calling an asset bundle, used to find the bundles to pregenerate
+CALL_ASSETS_XPATH = etree.XPath('//*[@t-call-assets]')
 
 def _id_or_xmlid(ref):
     try:
@@ -97,6 +150,60 @@ def _id_or_xmlid(ref):
         return ref
 
 
+@functools.lru_cache(maxsize=256)
+def link_to_node(path, defer_load=False, lazy_load=False, media=None):
+    """ Return the ``(tagName, attributes)`` of the asset node loading the
+    given path (or None if the type of file is not supported). The returned
+    attributes are read-only since the result is cached.
+    """
+    ext = path.rsplit('.', maxsplit=1)[-1] if path else 'js'
+    is_js = ext in SCRIPT_EXTENSIONS
+    is_xml = ext in TEMPLATE_EXTENSIONS
+    is_css = ext in STYLE_EXTENSIONS
+
+    if is_js:
+        is_asset_bundle = path and path.startswith('/web/assets/')
+        attributes = {
+            'type': 'text/javascript',
+        }
+
+        if defer_load:
+            # Note that "lazy_load" will lead to "defer" being added in JS,
+            # not here, otherwise this is not W3C valid (defer is probably
+            # not even needed there anyways). See LAZY_LOAD_DEFER.
+            attributes['defer'] = 'defer'
+        if path:
+            if lazy_load:
+                attributes['data-src'] = path
+            else:
+                attributes['src'] = path
+
+        if is_asset_bundle:
+            attributes['onerror'] = "__inphmsAssetError=1"
+
+        return ('script', frozendict(attributes))
+
+    if is_css:
+        attributes = {
+            'type': f'text/{ext}',  # we don't really expect to have anything else than pure css here
+            'rel': 'stylesheet',
+            'href': path,
+            'media': media,
+        }
+        return ('link', frozendict(attributes))
+
+    if is_xml:
+        attributes = {
+            'type': 'text/xml',
+            'async': 'async',
+            'rel': 'prefetch',
+            'data-src': path,
+            }
+        return ('script', frozendict(attributes))
+
+    return None
+
+
 def indent_code(code, level):
     """Indent the code to respect the python syntax."""
     return textwrap.indent(textwrap.dedent(code).strip(), ' ' * 4 * level)
@@ -117,9 +224,12 @@ def keep_query(*keep_params, **additional_params):
     if not keep_params and not additional_params:
         keep_params = ('*',)
     params = additional_params.copy()
-    qs_keys = list(request.httprequest.args) if request else []
+    if not request:
+        return werkzeug.urls.url_encode(params)
+    args = request.httprequest.args
+    # `fnmatch` caches the compiled pattern, the query string keys are unique
     for keep_param in keep_params:
-        for param in fnmatch.filter(qs_keys, keep_param):
-            if param not in additional_params and param in qs_keys:
-                params[param] = request.httprequest.args.getlist(param)
+        for param in fnmatch.filter(args, keep_param):
+            if param not in params:
+                params[param] = args.getlist(param)
     return werkzeug.urls.url_encode(params)
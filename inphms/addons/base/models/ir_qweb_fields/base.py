@@ -17,7 +17,7 @@ from inphms.tools import get_lang, _, babel_locale_parse, format_duration, float
 from inphms.tools.stringutils import format_decimalized_number
 from inphms.tools.mailutils import safe_attrs
 from inphms.orm import api, models, fields
-from .utils import nl2br, TIMEDELTA_UNITS
+from .utils import nl2br, TIMEDELTA_UNITS, TIMEDELTA_UNITS_SECONDS, get_timedelta_units
 from inphms import posix_to_ldml
 
 _logger = logging.getLogger(__name__)
@@ -621,7 +621,7 @@ class IrQwebFieldDuration(models.AbstractModel):
     @api.model
     def get_available_options(self):
         options = super().get_available_options()
-        unit = [(value, str(label)) for value, label, ratio in TIMEDELTA_UNITS]
+        unit = [(value, label) for value, label, ratio in get_timedelta_units(self.env.lang or 'en_US')]
         options.update(
             digital=dict(type="boolean", string=_('Digital formatting')),
             unit=dict(type="selection", params=unit, string=_('Date unit'), description=_('Date unit used for comparison and formatting'), default_value='second', required=True),
@@ -646,11 +646,9 @@ class IrQwebFieldDuration(models.AbstractModel):
 
     @api.model
     def value_to_html(self, value, options):
-        units = {unit: duration for unit, label, duration in TIMEDELTA_UNITS}
-
         locale = babel_locale_parse(self.user_lang().code)
-        factor = units[options.get('unit', 'second')]
-        round_to = units[options.get('round', 'second')]
+        factor = TIMEDELTA_UNITS_SECONDS[options.get('unit', 'second')]
+        round_to = TIMEDELTA_UNITS_SECONDS[options.get('round', 'second')]
 
         if options.get('digital') and round_to > 3600:
             round_to = 3600
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+import functools
+
 from markupsafe import Markup, escape_silent
 from inphms.tools.translate import LazyTranslate
+from ..ir_qweb.utils import escape_str
 
 _lt = LazyTranslate(__name__)
 
@@ -9,6 +12,10 @@ def nl2br(string: str) -> Markup:
     """ Converts newlines to HTML linebreaks in ``string`` after HTML-escaping
     it.
     """
+    if string.__class__ is str:
+        # escape the plain text and replace on the resulting str: this skips
+        # the escaping of the arguments done by `Markup.replace`
+        return Markup(escape_str(string).replace('\n', '<br>\n'))
     return escape_silent(string).replace('\n', Markup('<br>\n'))
 
 def nl2br_enclose(string: str, enclosure_tag: str = 'div') -> Markup:
@@ -30,3 +37,19 @@ TIMEDELTA_UNITS = (
     ('minute', _lt('minute'), 60),
     ('second', _lt('second'), 1)
 )
+
+# seconds per unit of TIMEDELTA_UNITS
+TIMEDELTA_UNITS_SECONDS = {unit: seconds for unit, _label, seconds in TIMEDELTA_UNITS}
+
+
+@functools.lru_cache(maxsize=64)
+def get_timedelta_units(lang: str) -> tuple[tuple[str, str, int], ...]:
+    """ Return ``TIMEDELTA_UNITS`` with the labels translated in ``lang``.
+
+    The code translations are loaded once per process and never reloaded,
+    so the result can be cached by language.
+    """
+    return tuple(
+        (unit, label._translate(lang), seconds)
+        for unit, label, seconds in TIMEDELTA_UNITS
+    )
@@ -3,8 +3,10 @@ import logging
 
 from datetime import datetime, timedelta
 
-from .utils import _predict_nextval, _create_sequence, _drop_sequences, _alter_sequence, _select_nextval, _update_nogap, UserError, _
+from .utils import _interpolation_keys, _INTERPOLATION_FORMATS, _predict_nextvals, _create_sequence, _create_sequences, _drop_sequences, _alter_sequence, _select_nextval, _update_nogap, UserError, _
+from inphms.databases import SQL
 from inphms.orm import models, api, fields
+from inphms import tools
 
 _logger = logging.getLogger(__name__)
 
@@ -22,17 +24,25 @@ class IrSequence(models.Model):
     _order = 'name, id'
     _allow_sudo_commands = False
 
+    @property
+    def _pg_seqname(self):
+        """ Name of the PostgreSQL sequence of a standard sequence. """
+        return 'ir_sequence_%03d' % self.id
+
+    @api.depends('number_next', 'implementation')
     def _get_number_next_actual(self):
         '''Return number from ir_sequence row when no_gap implementation,
         and number from postgres sequence when standard implementation.'''
+        nextvals = _predict_nextvals(self, [
+            seq._pg_seqname for seq in self if seq.id and seq.implementation == 'standard'
+        ])
         for seq in self:
             if not seq.id:
                 seq.number_next_actual = 0
             elif seq.implementation != 'standard':
                 seq.number_next_actual = seq.number_next
             else:
-                seq_id = "%03d" % seq.id
-                seq.number_next_actual = _predict_nextval(self, seq_id)
+                seq.number_next_actual = nextvals[seq._pg_seqname]
 
     def _set_number_next_actual(self):
         for seq in self:
@@ -47,10 +57,17 @@ class IrSequence(models.Model):
         if not self.use_date_range:
             return self
         sequence_date = sequence_date or fields.Date.today()
-        seq_date = self.env['ir.sequence.date_range'].search(
-            [('sequence_id', '=', self.id), ('date_from', '<=', sequence_date), ('date_to', '>=', sequence_date)], limit=1)
-        if seq_date:
-            return seq_date[0]
+        # drawing numbers is frequent: skip the ORM search machinery
+        DateRange = self.env['ir.sequence.date_range']
+        DateRange.flush_model(['sequence_id', 'date_from', 'date_to'])
+        rows = self.env.execute_query(SQL("""
+            SELECT id FROM ir_sequence_date_range
+             WHERE sequence_id = %s AND date_from <= %s AND date_to >= %s
+          ORDER BY id
+             LIMIT 1
+        """, self.id, sequence_date, sequence_date))
+        if rows:
+            return DateRange.browse(rows[0][0])
         #no date_range sequence was found, we create a new one
         return self._create_date_range_seq(sequence_date)
 
@@ -84,13 +101,22 @@ class IrSequence(models.Model):
         """ Create a sequence, in implementation == standard a fast gaps-allowed PostgreSQL sequence is used.
         """
         seqs = super().create(vals_list)
-        for seq in seqs:
-            if seq.implementation == 'standard':
-                _create_sequence(self.env.cr, "ir_sequence_%03d" % seq.id, seq.number_increment or 1, seq.number_next or 1)
+        _create_sequences(self.env.cr, [
+            (seq._pg_seqname, seq.number_increment or 1, seq.number_next or 1)
+            for seq in seqs
+            if seq.implementation == 'standard'
+        ])
+        self.env.registry.clear_cache('sequences')  # _get_sequence_id_by_code
         return seqs
 
     def unlink(self):
-        _drop_sequences(self.env.cr, ["ir_sequence_%03d" % x.id for x in self])
+        # the date ranges are deleted by the database (ondelete cascade),
+        # drop their sequences too
+        _drop_sequences(self.env.cr, [
+            *(seq._pg_seqname for seq in self),
+            *(seq._pg_seqname for seq in self.date_range_ids),
+        ])
+        self.env.registry.clear_cache('sequences')  # _get_sequence_id_by_code
         return super(IrSequence, self).unlink()
 
     def write(self, vals):
@@ -102,31 +128,52 @@ class IrSequence(models.Model):
             if seq.implementation == 'standard':
                 if new_implementation in ('standard', None):
                     # Implementation has NOT changed.
-                    # Only change sequence if really requested.
-                    if vals.get('number_next'):
-                        _alter_sequence(self.env.cr, "ir_sequence_%03d" % seq.id, number_next=n)
-                    if seq.number_increment != i:
-                        _alter_sequence(self.env.cr, "ir_sequence_%03d" % seq.id, number_increment=i)
+                    # Only change sequence if really requested, both changes
+                    # are done by a single ALTER SEQUENCE statement.
+                    number_next = n if vals.get('number_next') else None
+                    number_increment = i if seq.number_increment != i else None
+                    if number_next is not None or number_increment is not None:
+                        _alter_sequence(self.env.cr, seq._pg_seqname, number_increment=number_increment, number_next=number_next)
+                    if number_increment is not None:
                         seq.date_range_ids._alter_sequence(number_increment=i)
                 else:
-                    _drop_sequences(self.env.cr, ["ir_sequence_%03d" % seq.id])
+                    _drop_sequences(self.env.cr, [seq._pg_seqname])
                     for sub_seq in seq.date_range_ids:
-                        _drop_sequences(self.env.cr, ["ir_sequence_%03d_%03d" % (seq.id, sub_seq.id)])
+                        _drop_sequences(self.env.cr, [sub_seq._pg_seqname])
             else:
                 if new_implementation in ('no_gap', None):
                     pass
                 else:
-                    _create_sequence(self.env.cr, "ir_sequence_%03d" % seq.id, i, n)
+                    _create_sequence(self.env.cr, seq._pg_seqname, i, n)
                     for sub_seq in seq.date_range_ids:
-                        _create_sequence(self.env.cr, "ir_sequence_%03d_%03d" % (seq.id, sub_seq.id), i, n)
+                        _create_sequence(self.env.cr, sub_seq._pg_seqname, i, n)
         res = super().write(vals)
+        if vals.keys() & {'code', 'company_id', 'active'}:
+            self.env.registry.clear_cache('sequences')  # _get_sequence_id_by_code
         # DLE P179
-        self.flush_model(vals.keys())
+        if 'number_next' in vals:
+            self.flush_model(['number_next'])
         return res
 
+    @api.model
+    @tools.ormcache(cache='stable')
+    def _get_nextval_prefetch(self):
+        """ Return how many values of the standard sequences are taken at once
+        from PostgreSQL, see ``_select_nextval``. Prefetching saves queries when
+        many numbers are drawn with the same cursor, at the cost of gaps: the
+        system parameter ``base.sequence_nextval_prefetch`` must only be set
+        above 1 when no standard sequence is expected to be gapless. "No gap"
+        sequences never prefetch.
+
+        The parameter is read once, the cache is cleared when it is changed.
+        """
+        return max(int(self.env['ir.config_parameter'].sudo().get_param('base.sequence_nextval_prefetch', 1)), 1)
+
     def _next_do(self):
         if self.implementation == 'standard':
-            number_next = _select_nextval(self.env.cr, 'ir_sequence_%03d' % self.id)
+            number_next = _select_nextval(self.env.cr, self._pg_seqname, self._get_nextval_prefetch())
+            # the PostgreSQL sequence is not a dependency of the field
+            self.invalidate_recordset(['number_next_actual'], flush=False)
         else:
             number_next = _update_nogap(self, self.number_increment)
         return self.get_next_char(number_next)
@@ -135,28 +182,42 @@ class IrSequence(models.Model):
         def _interpolate(s, d):
             return (s % d) if s else ''
 
-        def _interpolation_dict():
-            now = range_date = effective_date = datetime.now(self.env.tz)
-            if date or self.env.context.get('ir_sequence_date'):
-                effective_date = fields.Datetime.from_string(date or self.env.context.get('ir_sequence_date'))
-            if date_range or self.env.context.get('ir_sequence_date_range'):
-                range_date = fields.Datetime.from_string(date_range or self.env.context.get('ir_sequence_date_range'))
-
-            sequences = {
-                'year': '%Y', 'month': '%m', 'day': '%d', 'y': '%y', 'doy': '%j', 'woy': '%W',
-                'weekday': '%w', 'h24': '%H', 'h12': '%I', 'min': '%M', 'sec': '%S',
-                'isoyear': '%G', 'isoy': '%g', 'isoweek': '%V',
-            }
-            res = {}
-            for key, format in sequences.items():
-                res[key] = effective_date.strftime(format)
-                res['range_' + key] = range_date.strftime(format)
-                res['current_' + key] = now.strftime(format)
+        def _interpolation_dict(keys):
+            dates = {}
 
+            def _get_date(kind):
+                # compute each date (and the current time) once, if needed
+                if kind not in dates:
+                    if kind == 'current':
+                        dates[kind] = datetime.now(self.env.tz)
+                    elif kind == 'range' and (date_range or self.env.context.get('ir_sequence_date_range')):
+                        dates[kind] = fields.Datetime.from_string(date_range or self.env.context.get('ir_sequence_date_range'))
+                    elif kind == 'effective' and (date or self.env.context.get('ir_sequence_date')):
+                        dates[kind] = fields.Datetime.from_string(date or self.env.context.get('ir_sequence_date'))
+                    else:
+                        dates[kind] = _get_date('current')
+                return dates[kind]
+
+            # only format the keys used in the prefix and suffix, an unknown
+            # key raises a KeyError when interpolating
+            res = {}
+            for key in keys:
+                if key.startswith('range_'):
+                    kind, format = 'range', _INTERPOLATION_FORMATS.get(key[6:])
+                elif key.startswith('current_'):
+                    kind, format = 'current', _INTERPOLATION_FORMATS.get(key[8:])
+                else:
+                    kind, format = 'effective', _INTERPOLATION_FORMATS.get(key)
+                if format:
+                    res[key] = _get_date(kind).strftime(format)
             return res
 
         self.ensure_one()
-        d = _interpolation_dict()
+        prefix, suffix = self.prefix or '', self.suffix or ''
+        if '%' not in prefix and '%' not in suffix:
+            # nothing to interpolate, e.g. no prefix nor suffix
+            return prefix, suffix
+        d = _interpolation_dict(_interpolation_keys(self.prefix) | _interpolation_keys(self.suffix))
         try:
             interpolated_prefix = _interpolate(self.prefix, d)
             interpolated_suffix = _interpolate(self.suffix, d)
@@ -166,18 +227,27 @@ class IrSequence(models.Model):
 
     def get_next_char(self, number_next):
         interpolated_prefix, interpolated_suffix = self._get_prefix_suffix()
-        return interpolated_prefix + '%%0%sd' % self.padding % number_next + interpolated_suffix
+        return f'{interpolated_prefix}{number_next:0{self.padding}d}{interpolated_suffix}'
 
     def _create_date_range_seq(self, date):
         year = fields.Date.from_string(date).strftime('%Y')
         date_from = '{}-01-01'.format(year)
         date_to = '{}-12-31'.format(year)
-        date_range = self.env['ir.sequence.date_range'].search([('sequence_id', '=', self.id), ('date_from', '>=', date), ('date_from', '<=', date_to)], order='date_from desc', limit=1)
-        if date_range:
-            date_to = date_range.date_from + timedelta(days=-1)
-        date_range = self.env['ir.sequence.date_range'].search([('sequence_id', '=', self.id), ('date_to', '>=', date_from), ('date_to', '<=', date)], order='date_to desc', limit=1)
-        if date_range:
-            date_from = date_range.date_to + timedelta(days=1)
+        # the new range ends before the next range of the year, and starts
+        # after the previous range of the year
+        self.env['ir.sequence.date_range'].flush_model(['sequence_id', 'date_from', 'date_to'])
+        [(next_date_from, previous_date_to)] = self.env.execute_query(SQL("""
+            SELECT (SELECT date_from FROM ir_sequence_date_range
+                     WHERE sequence_id = %(seq_id)s AND date_from >= %(date)s AND date_from <= %(date_to)s
+                  ORDER BY date_from DESC LIMIT 1),
+                   (SELECT date_to FROM ir_sequence_date_range
+                     WHERE sequence_id = %(seq_id)s AND date_to >= %(date_from)s AND date_to <= %(date)s
+                  ORDER BY date_to DESC LIMIT 1)
+        """, seq_id=self.id, date=date, date_from=date_from, date_to=date_to))
+        if next_date_from:
+            date_to = next_date_from + timedelta(days=-1)
+        if previous_date_to:
+            date_from = previous_date_to + timedelta(days=1)
         seq_date_range = self.env['ir.sequence.date_range'].sudo().create({
             'date_from': date_from,
             'date_to': date_to,
@@ -191,9 +261,25 @@ class IrSequence(models.Model):
             return self._next_do()
         # date mode
         dt = sequence_date or self.env.context.get('ir_sequence_date', fields.Date.today())
-        seq_date = self.env['ir.sequence.date_range'].search([('sequence_id', '=', self.id), ('date_from', '<=', dt), ('date_to', '>=', dt)], limit=1)
-        if not seq_date:
-            seq_date = self._create_date_range_seq(dt)
+        if self.implementation == 'standard' and self._get_nextval_prefetch() <= 1:
+            # find the current date range and draw its next number in a single
+            # query, the name of its sequence is the same as `_pg_seqname`
+            self.env['ir.sequence.date_range'].flush_model(['sequence_id', 'date_from', 'date_to'])
+            rows = self.env.execute_query(SQL("""
+                SELECT date_from, nextval(format('ir_sequence_%%s_%%s',
+                                                 lpad(sequence_id::text, greatest(3, length(sequence_id::text)), '0'),
+                                                 lpad(id::text, greatest(3, length(id::text)), '0')))
+                  FROM (SELECT id, sequence_id, date_from FROM ir_sequence_date_range
+                         WHERE sequence_id = %s AND date_from <= %s AND date_to >= %s
+                      ORDER BY id
+                         LIMIT 1) AS date_range
+            """, self.id, dt, dt))
+            if rows:
+                [(date_from, number_next)] = rows
+                self.env['ir.sequence.date_range'].invalidate_model(['number_next_actual'], flush=False)
+                return self.with_context(ir_sequence_date_range=date_from).get_next_char(number_next)
+        seq_date = self._get_current_sequence(sequence_date=dt)
+        # the range start date is used to interpolate the prefix and suffix
         return seq_date.with_context(ir_sequence_date_range=seq_date.date_from)._next()
 
     def next_by_id(self, sequence_date=None):
@@ -209,10 +295,24 @@ class IrSequence(models.Model):
             be used.
         """
         self.browse().check_access('read')
-        company_id = self.env.company.id
-        seq_ids = self.search([('code', '=', sequence_code), ('company_id', 'in', [company_id, False])], order='company_id')
-        if not seq_ids:
+        seq_id = self._get_sequence_id_by_code(sequence_code, self.env.company.id)
+        if not seq_id:
             _logger.debug("No ir.sequence has been found for code '%s'. Please make sure a sequence is set for current company." % sequence_code)
             return False
-        seq_id = seq_ids[0]
-        return seq_id._next(sequence_date=sequence_date)
+        return self.browse(seq_id)._next(sequence_date=sequence_date)
+
+    @api.model
+    @tools.ormcache('sequence_code', 'company_id', 'self.env.context.get("active_test", True)', cache='sequences')
+    def _get_sequence_id_by_code(self, sequence_code, company_id):
+        """ Return the id of the sequence with the given code for the company
+        (a sequence of the company is preferred over a sequence shared by all
+        companies), or None. Archived sequences are only considered with
+        ``active_test=False`` in the context, like in a search.
+
+        The lookup ignores record rules, so that its result can be shared by
+        all users: ``next_by_code`` only checks the access rights.
+        """
+        seq = self.sudo().search([
+            ('code', '=', sequence_code), ('company_id', 'in', [company_id, False]),
+        ], order='company_id', limit=1)
+        return seq.id or None
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from .utils import _predict_nextval, _alter_sequence, _update_nogap, _select_nextval, _create_sequence, _drop_sequences
+from .utils import _predict_nextvals, _alter_sequence, _update_nogap, _select_nextval, _create_sequences, _drop_sequences
 from inphms.orm import models, api, fields
 
 
@@ -15,15 +15,25 @@ class IrSequenceDate_Range(models.Model):
         "You cannot create two date ranges for the same sequence with the same date range.",
     )
 
+    @property
+    def _pg_seqname(self):
+        """ Name of the PostgreSQL sequence of a standard date range. """
+        return 'ir_sequence_%03d_%03d' % (self.sequence_id.id, self.id)
+
+    @api.depends('number_next', 'sequence_id.implementation')
     def _get_number_next_actual(self):
         '''Return number from ir_sequence row when no_gap implementation,
         and number from postgres sequence when standard implementation.'''
+        nextvals = _predict_nextvals(self, [
+            seq._pg_seqname for seq in self if seq.id and seq.sequence_id.implementation == 'standard'
+        ])
         for seq in self:
-            if seq.sequence_id.implementation != 'standard':
+            if not seq.id:
+                seq.number_next_actual = seq.number_next
+            elif seq.sequence_id.implementation != 'standard':
                 seq.number_next_actual = seq.number_next
             else:
-                seq_id = "%03d_%03d" % (seq.sequence_id.id, seq.id)
-                seq.number_next_actual = _predict_nextval(self, seq_id)
+                seq.number_next_actual = nextvals[seq._pg_seqname]
 
     def _set_number_next_actual(self):
         for seq in self:
@@ -47,28 +57,31 @@ class IrSequenceDate_Range(models.Model):
 
     def _next(self):
         if self.sequence_id.implementation == 'standard':
-            number_next = _select_nextval(self.env.cr, 'ir_sequence_%03d_%03d' % (self.sequence_id.id, self.id))
+            number_next = _select_nextval(self.env.cr, self._pg_seqname, self.sequence_id._get_nextval_prefetch())
+            # the PostgreSQL sequence is not a dependency of the field
+            self.invalidate_recordset(['number_next_actual'], flush=False)
         else:
             number_next = _update_nogap(self, self.sequence_id.number_increment)
         return self.sequence_id.get_next_char(number_next)
 
     def _alter_sequence(self, number_increment=None, number_next=None):
         for seq in self:
-            _alter_sequence(self.env.cr, "ir_sequence_%03d_%03d" % (seq.sequence_id.id, seq.id), number_increment=number_increment, number_next=number_next)
+            _alter_sequence(self.env.cr, seq._pg_seqname, number_increment=number_increment, number_next=number_next)
 
     @api.model_create_multi
     def create(self, vals_list):
         """ Create a sequence, in implementation == standard a fast gaps-allowed PostgreSQL sequence is used.
         """
         seqs = super().create(vals_list)
-        for seq in seqs:
-            main_seq = seq.sequence_id
-            if main_seq.implementation == 'standard':
-                _create_sequence(self.env.cr, "ir_sequence_%03d_%03d" % (main_seq.id, seq.id), main_seq.number_increment, seq.number_next_actual or 1)
+        _create_sequences(self.env.cr, [
+            (seq._pg_seqname, seq.sequence_id.number_increment, seq.number_next_actual or 1)
+            for seq in seqs
+            if seq.sequence_id.implementation == 'standard'
+        ])
         return seqs
 
     def unlink(self):
-        _drop_sequences(self.env.cr, ["ir_sequence_%03d_%03d" % (x.sequence_id.id, x.id) for x in self])
+        _drop_sequences(self.env.cr, [seq._pg_seqname for seq in self])
         return super().unlink()
 
     def write(self, vals):
@@ -84,5 +97,6 @@ class IrSequenceDate_Range(models.Model):
         #  - But selecting the number next happens a lot,
         # Therefore, if I chose to put the flush just above the select, it would check the flush most of the time for no reason.
         res = super().write(vals)
-        self.flush_model(vals.keys())
+        if 'number_next' in vals:
+            self.flush_model(['number_next'])
         return res
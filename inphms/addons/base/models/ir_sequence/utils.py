@@ -1,22 +1,55 @@
 from __future__ import annotations
 
+import functools
+import re
+
 from inphms.databases import SQL
 from inphms.exceptions import UserError
 from inphms.tools import _
 
 
+# strftime format of the keys available in the prefix and suffix of the
+# sequences, also available as `range_<key>` and `current_<key>`
+_INTERPOLATION_FORMATS = {
+    'year': '%Y', 'month': '%m', 'day': '%d', 'y': '%y', 'doy': '%j', 'woy': '%W',
+    'weekday': '%w', 'h24': '%H', 'h12': '%I', 'min': '%M', 'sec': '%S',
+    'isoyear': '%G', 'isoy': '%g', 'isoweek': '%V',
+}
+_INTERPOLATION_KEY_REGEXP = re.compile(r'%\((\w+)\)')
+
+
+@functools.lru_cache(maxsize=256)
+def _interpolation_keys(pattern):
+    """ Return the keys used by the %-format ``pattern`` (prefix or suffix of
+    a sequence). """
+    return frozenset(_INTERPOLATION_KEY_REGEXP.findall(pattern)) if pattern else frozenset()
+
+
 def _create_sequence(cr, seq_name, number_increment, number_next):
     """ Create a PostreSQL sequence. """
-    if number_increment == 0:
+    _create_sequences(cr, [(seq_name, number_increment, number_next)])
+
+
+def _create_sequences(cr, sequences):
+    """ Create PostgreSQL sequences in a single query.
+
+    :param sequences: list of ``(seq_name, number_increment, number_next)``
+    """
+    if not sequences:
+        return
+    if any(number_increment == 0 for _seq_name, number_increment, _number_next in sequences):
         raise UserError(_('Step must not be zero.'))
-    sql = "CREATE SEQUENCE %s INCREMENT BY %%s START WITH %%s" % seq_name
-    cr.execute(sql, (number_increment, number_next))
+    cr.execute(SQL(";").join(
+        SQL("CREATE SEQUENCE %s INCREMENT BY %s START WITH %s", SQL.identifier(seq_name), number_increment, number_next)
+        for seq_name, number_increment, number_next in sequences
+    ))
 
 
 def _drop_sequences(cr, seq_names):
     """ Drop the PostreSQL sequences if they exist. """
     if not seq_names:
         return
+    _clear_prefetched_values(cr, seq_names)
     names = SQL(',').join(map(SQL.identifier, seq_names))
     # RESTRICT is the default; it prevents dropping the sequence if an
     # object depends on it.
@@ -27,12 +60,11 @@ def _alter_sequence(cr, seq_name, number_increment=None, number_next=None):
     """ Alter a PostreSQL sequence. """
     if number_increment == 0:
         raise UserError(_("Step must not be zero."))
-    cr.execute("SELECT relname FROM pg_class WHERE relkind=%s AND relname=%s", ('S', seq_name))
-    if not cr.fetchone():
-        # sequence is not created yet, we're inside create() so ignore it, will be set later
-        return
+    _clear_prefetched_values(cr, [seq_name])
+    # IF EXISTS: the sequence is not created yet when we're inside create(),
+    # it will be set later
     statement = SQL(
-        "ALTER SEQUENCE %s%s%s",
+        "ALTER SEQUENCE IF EXISTS %s%s%s",
         SQL.identifier(seq_name),
         SQL(" INCREMENT BY %s", number_increment) if number_increment is not None else SQL(),
         SQL(" RESTART WITH %s", number_next) if number_next is not None else SQL(),
@@ -40,33 +72,86 @@ def _alter_sequence(cr, seq_name, number_increment=None, number_next=None):
     cr.execute(statement)
 
 
-def _select_nextval(cr, seq_name):
-    cr.execute("SELECT nextval(%s)", [seq_name])
-    return cr.fetchone()
+def _select_nextval(cr, seq_name, prefetch=1):
+    """ Return the next value of the PostgreSQL sequence.
+
+    With ``prefetch > 1``, the following values of the sequence are taken in
+    the same query and kept on the cursor to be returned by the next calls.
+    The values taken are never given back to the sequence, so the values
+    which are not used before the cursor is closed become gaps, like the
+    values drawn by a transaction which is rolled back. Only use it for
+    sequences which may have gaps.
+    """
+    if prefetch <= 1:
+        cr.execute("SELECT nextval(%s)", [seq_name])
+        return cr.fetchone()[0]
+    prefetched = cr.cache.setdefault('ir_sequence_nextval', {})
+    values = prefetched.get(seq_name)
+    if not values:
+        cr.execute("SELECT nextval(%s) FROM generate_series(1, %s)", [seq_name, prefetch])
+        # reversed, to pop the values in order
+        values = prefetched[seq_name] = [value for [value] in reversed(cr.fetchall())]
+    return values.pop()
+
+
+def _clear_prefetched_values(cr, seq_names):
+    """ Forget the values prefetched by ``_select_nextval`` for the given
+    sequences (they are altered or dropped). """
+    prefetched = cr.cache.get('ir_sequence_nextval')
+    if prefetched:
+        for seq_name in seq_names:
+            prefetched.pop(seq_name, None)
 
 
 def _update_nogap(self, number_increment):
     self.flush_recordset(['number_next'])
-    number_next = self.number_next
-    self.env.cr.execute("SELECT number_next FROM %s WHERE id=%%s FOR UPDATE NOWAIT" % self._table, [self.id])
-    self.env.cr.execute("UPDATE %s SET number_next=number_next+%%s WHERE id=%%s " % self._table, (number_increment, self.id))
-    self.invalidate_recordset(['number_next'])
+    # lock the row without waiting (a concurrent draw makes the transaction
+    # fail and be retried), increment it and return the previous value, in
+    # a single query
+    table = SQL.identifier(self._table)
+    [(number_next,)] = self.env.execute_query(SQL("""
+        WITH locked AS (SELECT id FROM %s WHERE id = %s FOR UPDATE NOWAIT)
+        UPDATE %s SET number_next = number_next + %s
+          FROM locked
+         WHERE %s.id = locked.id
+     RETURNING number_next - %s
+    """, table, self.id, table, number_increment, table, number_increment))
+    self.invalidate_recordset(['number_next', 'number_next_actual'])
     return number_next
 
 def _predict_nextval(self, seq_id):
     """Predict next value for PostgreSQL sequence without consuming it"""
-    # Cannot use currval() as it requires prior call to nextval()
     seqname = 'ir_sequence_%s' % seq_id
-    seqtable = SQL.identifier(seqname)
-    query = SQL("""
-        SELECT last_value,
-            (SELECT increment_by FROM pg_sequences WHERE sequencename = %s),
-            is_called
-        FROM %s""", seqname, seqtable)
-    if self.env.cr._cnx.server_version < 100000:
-        query = SQL("SELECT last_value, increment_by, is_called FROM %s", seqtable)
-    [(last_value, increment_by, is_called)] = self.env.execute_query(query)
-    if is_called:
-        return last_value + increment_by
-    # sequence has just been RESTARTed to return last_value next time
-    return last_value
+    return _predict_nextvals(self, [seqname])[seqname]
+
+
+def _predict_nextvals(self, seqnames):
+    """Predict the next values of PostgreSQL sequences without consuming
+    them, in a single query. Returns a dict ``{seqname: next_value}``."""
+    result = {}
+    prefetched = self.env.cr.cache.get('ir_sequence_nextval', {})
+    queries = []
+    for seqname in seqnames:
+        if values := prefetched.get(seqname):
+            result[seqname] = values[-1]
+            continue
+        # Cannot use currval() as it requires prior call to nextval()
+        seqtable = SQL.identifier(seqname)
+        if self.env.cr._cnx.server_version < 100000:
+            query = SQL("SELECT %s, last_value, increment_by, is_called FROM %s", seqname, seqtable)
+        else:
+            query = SQL("""
+                SELECT %s, last_value,
+                    (SELECT increment_by FROM pg_sequences WHERE sequencename = %s),
+                    is_called
+                FROM %s""", seqname, seqname, seqtable)
+        queries.append(query)
+    if not queries:
+        return result
+    for seqname, last_value, increment_by, is_called in self.env.execute_query(SQL(" UNION ALL ").join(queries)):
+        if is_called:
+            result[seqname] = last_value + increment_by
+        else:
+            # sequence has just been RESTARTed to return last_value next time
+            result[seqname] = last_value
+    return result
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from collections import defaultdict
+
 from lxml import etree
 from lxml.builder import E
 
@@ -7,11 +9,36 @@ from inphms import tools
 from inphms.config import config
 from inphms.tools import frozendict, _
 from inphms.exceptions import UserError
-from inphms.databases import SQL
 from inphms.orm.models.utils import MAGIC_COLUMNS
 from inphms.orm import models, fields, api
 from .utils import _logger
 
+# field attributes required by the web client, see `_get_view_field_attributes`
+VIEW_FIELD_ATTRIBUTES = (
+    'change_default', 'context', 'currency_field', 'definition_record', 'definition_record_field', 'digits', 'domain', 'aggregator', 'groups',
+    'help', 'model_field', 'name', 'readonly', 'related', 'relation', 'relation_field', 'required', 'searchable', 'selection', 'size',
+    'sortable', 'store', 'string', 'translate', 'trim', 'type', 'groupable', 'falsy_value_label',
+)
+
+
+def _field_children(node):
+    """ Return a dict mapping each field node of ``node`` to the list of the
+    field nodes it contains that are not inside another field, and ``None``
+    to the top-level field nodes. The nodes are listed in document order.
+    """
+    children = {}
+    for field_node in node.iter('field'):
+        parent = next(field_node.iterancestors('field'), None)
+        children.setdefault(parent, []).append(field_node)
+    return children
+
+
+def _arch_node(arch):
+    """ Return the etree node of a view arch, parsing it only if necessary. """
+    if isinstance(arch, etree._Element):
+        return arch
+    return etree.fromstring(arch)
+
 
 class Base(models.AbstractModel):
     _inherit = 'base'
@@ -59,39 +86,40 @@ class Base(models.AbstractModel):
         :returns: a form view as an lxml document
         :rtype: etree._Element
         """
-        sheet = E.sheet(string=self._description)
-        main_group = E.group()
-        left_group = E.group()
-        right_group = E.group()
+        # field names of the current left and right groups, the elements are
+        # only built once the groups are complete
+        sheet_children = []
+        left_fnames = []
+        right_fnames = []
+
+        def main_group():
+            group = E.group(*(
+                E.group(*(E.field(name=fname) for fname in fnames))
+                for fnames in (left_fnames, right_fnames)
+                if fnames
+            ))
+            left_fnames.clear()
+            right_fnames.clear()
+            return group
+
         for fname, field in self._fields.items():
             if fname in MAGIC_COLUMNS or (fname == 'display_name' and field.readonly):
                 continue
             elif field.type == "binary" and not isinstance(field, fields.Image) and not field.store:
                 continue
             elif field.type in ('one2many', 'many2many', 'text', 'html'):
-                # append to sheet left and right group if needed
-                if len(left_group) > 0:
-                    main_group.append(left_group)
-                    left_group = E.group()
-                if len(right_group) > 0:
-                    main_group.append(right_group)
-                    right_group = E.group()
-                if len(main_group) > 0:
-                    sheet.append(main_group)
-                    main_group = E.group()
+                # append the pending left and right groups to the sheet
+                if left_fnames or right_fnames:
+                    sheet_children.append(main_group())
                 # add an oneline group for field type 'one2many', 'many2many', 'text', 'html'
-                sheet.append(E.group(E.field(name=fname)))
+                sheet_children.append(E.group(E.field(name=fname)))
+            elif len(left_fnames) > len(right_fnames):
+                right_fnames.append(fname)
             else:
-                if len(left_group) > len(right_group):
-                    right_group.append(E.field(name=fname))
-                else:
-                    left_group.append(E.field(name=fname))
-        if len(left_group) > 0:
-            main_group.append(left_group)
-        if len(right_group) > 0:
-            main_group.append(right_group)
-        sheet.append(main_group)
-        sheet.append(E.group(E.separator()))
+                left_fnames.append(fname)
+        sheet_children.append(main_group())
+        sheet_children.append(E.group(E.separator()))
+        sheet = E.sheet(*sheet_children, string=self._description)
         return E.form(sheet)
 
     @api.model
@@ -226,16 +254,17 @@ class Base(models.AbstractModel):
             for [v_id, v_type] in views
         }
 
-        models = {}
+        models = defaultdict(set)
         for view in result['views'].values():
             for model, model_fields in view.pop('models').items():
-                models.setdefault(model, set()).update(model_fields)
+                models[model].update(model_fields)
 
         result['models'] = {}
 
+        field_attributes = self._get_view_field_attributes()
         for model, model_fields in models.items():
             result['models'][model] = {"fields": self.env[model].fields_get(
-                allfields=model_fields, attributes=self._get_view_field_attributes()
+                allfields=model_fields, attributes=field_attributes
             )}
 
         # Add related action information if asked
@@ -293,14 +322,10 @@ class Base(models.AbstractModel):
             view_ref = self.env.context.get(view_ref_key)
             if view_ref:
                 if '.' in view_ref:
-                    module, view_ref = view_ref.split('.', 1)
-
-                    sql = SQL(
-                        "SELECT res_id FROM ir_model_data WHERE model='ir.ui.view' AND module=%s AND name=%s",
-                        module, view_ref,
-                    )
-                    if view_ref_res := self.env.execute_query(sql):
-                        [[view_id]] = view_ref_res
+                    # cached lookup of the external id
+                    res_model, res_id = self.env['ir.model.data']._xmlid_to_res_model_res_id(view_ref)
+                    if res_model == 'ir.ui.view':
+                        view_id = res_id
                 else:
                     _logger.warning(
                         '%r requires a fully-qualified external id (got: %r for model %s). '
@@ -319,10 +344,10 @@ class Base(models.AbstractModel):
         else:
             # fallback on default views methods if no ir.ui.view could be found
             view = IrUiView.browse()
-            try:
-                arch = getattr(self, '_get_default_%s_view' % view_type)()
-            except AttributeError:
+            get_default_view = getattr(self, f'_get_default_{view_type}_view', None)
+            if get_default_view is None:
                 raise UserError(_("No default view of type '%s' could be found!", view_type))
+            arch = get_default_view()
         return arch, view
 
     def _get_view_postprocessed(self, view, arch, **options):
@@ -367,9 +392,9 @@ class Base(models.AbstractModel):
         :return: a cache key
         :rtype: tuple
         """
-        return (view_id, view_type, options.get('mobile'), self.env.lang) + tuple(
-            (key, value) for key, value in self.env.context.items() if key.endswith('_view_ref')
-        )
+        key = (view_id, view_type, options.get('mobile'), self.env.lang)
+        view_refs = [item for item in self.env.context.items() if item[0].endswith('_view_ref')]
+        return (*key, *view_refs) if view_refs else key
 
     @api.model
     @tools.conditional(
@@ -459,7 +484,8 @@ class Base(models.AbstractModel):
         node = etree.fromstring(result['arch'])
         node = self.env['ir.ui.view']._postprocess_access_rights(node)
         node = self.env['ir.ui.view']._postprocess_debug(node)
-        result['arch'] = etree.tostring(node, encoding="unicode").replace('\t', '')
+        # strip the tabs from the utf-8 bytes, faster than on the decoded str
+        result['arch'] = etree.tostring(node, encoding="utf-8").translate(None, b'\t').decode()
 
         return result
 
@@ -483,9 +509,9 @@ class Base(models.AbstractModel):
         elif view_type == 'search':
             models[self._name] = list(self._fields.keys())
         elif view_type == 'graph':
-            models[self._name].union(fname for fname, field in self._fields.items() if field.type in ('integer', 'float'))
+            models[self._name] |= {fname for fname, field in self._fields.items() if field.type in ('integer', 'float')}
         elif view_type == 'pivot':
-            models[self._name].union(fname for fname, field in self._fields.items() if field._description_groupable(self.env))
+            models[self._name] |= {fname for fname, field in self._fields.items() if field._description_groupable(self.env)}
         return models
 
     @api.model
@@ -498,11 +524,7 @@ class Base(models.AbstractModel):
         :return: string list of field attribute names
         :rtype: list
         """
-        return [
-            'change_default', 'context', 'currency_field', 'definition_record', 'definition_record_field', 'digits', 'domain', 'aggregator', 'groups',
-            'help', 'model_field', 'name', 'readonly', 'related', 'relation', 'relation_field', 'required', 'searchable', 'selection', 'size',
-            'sortable', 'store', 'string', 'translate', 'trim', 'type', 'groupable', 'falsy_value_label'
-        ]
+        return list(VIEW_FIELD_ATTRIBUTES)
 
     @api.readonly
     def get_formview_id(self, access_uid=None):
@@ -559,36 +581,40 @@ class Base(models.AbstractModel):
     @api.model
     def _onchange_spec(self, view_info=None):
         """ Return the onchange spec from a view description; if not given, the
-            result of ``self.get_view()`` is used.
+            result of ``self.get_view()`` is used. The arch of the view
+            description may be given as an already parsed etree node.
         """
         result = {}
 
-        # for traversing the XML arch and populating result
-        def process(node, info, prefix):
-            if node.tag == 'field':
+        # for traversing the field nodes of the XML arch and populating result
+        def process(field_nodes, prefix):
+            for node in field_nodes:
                 name = node.attrib['name']
                 names = "%s.%s" % (prefix, name) if prefix else name
                 if not result.get(names):
                     result[names] = node.attrib.get('on_change')
-                # traverse the subviews included in relational fields
-                for child_view in node.xpath("./*[descendant::field]"):
-                    process(child_view, None, names)
-            else:
-                for child in node:
-                    process(child, info, prefix)
+                # traverse the subviews included in relational fields; a field
+                # placed directly inside the field node is not part of them,
+                # unless it contains fields itself
+                process([
+                    child for child in children.get(node, ())
+                    if child.getparent() is not node or child in children
+                ], names)
 
         if view_info is None:
             view_info = self.get_view()
-        process(etree.fromstring(view_info['arch']), view_info, '')
+        children = _field_children(_arch_node(view_info['arch']))
+        process(children.get(None, ()), '')
         return result
 
     @api.model
     def _get_fields_spec(self, view_info=None):
         """ Return the fields specification from a view description; if not
-        given, the result of ``self.get_view()`` is used.
+        given, the result of ``self.get_view()`` is used. The arch of the view
+        description may be given as an already parsed etree node.
         """
-        def fill_spec(node, model, fields_spec):
-            if node.tag == 'field':
+        def fill_spec(field_nodes, model, fields_spec):
+            for node in field_nodes:
                 field_name = node.attrib['name']
                 field_spec = fields_spec.setdefault(field_name, {})
                 field = model._fields.get(field_name)
@@ -598,19 +624,16 @@ class Base(models.AbstractModel):
                         sub_fields_spec.setdefault('display_name', {})
                     if field.relational:
                         comodel = model.env[field.comodel_name]
-                        for child in node:
-                            fill_spec(child, comodel, sub_fields_spec)
+                        fill_spec(children.get(node, ()), comodel, sub_fields_spec)
                     if field.type == 'one2many':
                         sub_fields_spec.pop(field.inverse_name, None)
                     if sub_fields_spec:
                         field_spec.setdefault('fields', {}).update(sub_fields_spec)
-            else:
-                for child in node:
-                    fill_spec(child, model, fields_spec)
 
         if view_info is None:
             view_info = self.get_view()
 
         result = {}
-        fill_spec(etree.fromstring(view_info['arch']), self, result)
+        children = _field_children(_arch_node(view_info['arch']))
+        fill_spec(children.get(None, ()), self, result)
         return result
@@ -51,6 +51,7 @@ class ResetViewArchWizard(models.TransientModel):
                 name += span % (view_id.key or view_id.xml_id)
             return name
 
+        dark_color_scheme = bool(request) and request.cookies.get('color_scheme') == 'dark'
         for view in self:
             diff_to = False
             diff_to_name = False
@@ -75,7 +76,7 @@ class ResetViewArchWizard(models.TransientModel):
                     (view_arch, get_table_name(view.view_id) if view.reset_mode == 'other_view' else _("Current Arch")),
                     (diff_to, diff_to_name),
                     custom_style=False,
-                    dark_color_scheme=request and request.cookies.get('color_scheme') == 'dark',
+                    dark_color_scheme=dark_color_scheme,
                 )
                 view.has_diff = view_arch != diff_to
 
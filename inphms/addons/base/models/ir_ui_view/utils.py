@@ -3,6 +3,7 @@ import re
 import logging
 import collections
 import functools
+import operator
 
 from lxml import etree
 from markupsafe import Markup
@@ -60,25 +61,34 @@ def _hasclass(context, *cls):
 def get_view_arch_from_file(filepath, xmlid):
     module, view_id = xmlid.split('.')
 
-    xpath = f"//*[@id='{xmlid}' or @id='{view_id}']"
     # when view is created from model with inheritS of ir_ui_view, the
     # xmlid has been suffixed by '_ir_ui_view'. We need to also search
     # for views without this prefix.
+    ids = {xmlid, view_id}
     if view_id.endswith('_ir_ui_view'):
         # len('_ir_ui_view') == 11
-        xpath = xpath[:-1] + f" or @id='{xmlid[:-11]}' or @id='{view_id[:-11]}']"
-
-    document = etree.parse(filepath)
-    for node in document.xpath(xpath):
+        ids.update((xmlid[:-11], view_id[:-11]))
+
+    # parse the file up to the view only, and free the records and templates
+    # already parsed (but not the ones inside a view arch)
+    # ids are looked up by iteration, and data files do not define entities
+    for _event, node in etree.iterparse(filepath, tag=('record', 'template'), collect_ids=False, resolve_entities=False):
+        if node.get('id') not in ids:
+            if next(node.iterancestors('record', 'template'), None) is None:
+                node.clear()
+                while node.getprevious() is not None:
+                    del node.getparent()[0]
+            continue
         if node.tag == 'record':
             field_arch = node.find('field[@name="arch"]')
             if field_arch is not None:
                 _fix_multiple_roots(field_arch)
-                inner = ''.join(
+                # serialize the children one by one, so that each of them
+                # keeps the namespace declarations inherited from the file
+                return (field_arch.text or '') + ''.join(
                     etree.tostring(child, encoding='unicode')
                     for child in field_arch.iterchildren()
                 )
-                return field_arch.text + inner
 
             field_view = node.find('field[@name="view_id"]')
             if field_view is not None:
@@ -96,7 +106,8 @@ def get_view_arch_from_file(filepath, xmlid):
             else:
                 node.tag = 'data'
             node.attrib.pop('id', None)
-            return etree.tostring(node, encoding='unicode')
+            # the tail of the node is not parsed yet
+            return etree.tostring(node, encoding='unicode', with_tail=False)
 
     _logger.warning("Could not find view arch definition in file '%s' for xmlid '%s'", filepath, xmlid)
     return None
@@ -108,6 +119,19 @@ xpath_utils['hasclass'] = _hasclass
 ################
 # CLASS HELPER #
 ################
+class _FieldGroups(dict):
+    """ The field groups of a :class:`NameManager`, computed on first access. """
+    __slots__ = ('name_manager',)
+
+    def __init__(self, name_manager):
+        super().__init__()
+        self.name_manager = name_manager
+
+    def __missing__(self, name):
+        value = self[name] = self.name_manager._compute_field_groups(name)
+        return value
+
+
 class NameManager:
     """ An object that manages all the named elements in a view. """
 
@@ -133,7 +157,7 @@ class NameManager:
         self.model_groups = self.group_definitions.universe if model_groups is None else model_groups
 
         # this maps field names to the group of users that have access to the field
-        self.field_groups = {}
+        self.field_groups = _FieldGroups(self)
 
     @functools.cached_property
     def field_info(self):
@@ -144,9 +168,16 @@ class NameManager:
         return field_info
 
     def has_field(self, node, name, node_info, info=frozendict()):
-        self.available_fields[name].setdefault('info', {}).update(info)
+        available_field = self.available_fields[name]
+        if 'info' in available_field:
+            available_field['info'].update(info)
+        else:
+            available_field['info'] = dict(info)
         self.field_groups[name] = node_info['model_groups']
-        self.available_fields[name].setdefault('groups', []).append(node_info['view_groups'])
+        if 'groups' in available_field:
+            available_field['groups'].append(node_info['view_groups'])
+        else:
+            available_field['groups'] = [node_info['view_groups']]
         self.available_names.add(info.get('id') or name)
 
     def has_action(self, name):
@@ -173,9 +204,10 @@ class NameManager:
 
     def _get_field_groups(self, name):
         """ Return the group expression representing the users having read access to the field. """
-        if name in self.field_groups:
-            return self.field_groups[name]
+        return self.field_groups[name]
 
+    def _compute_field_groups(self, name):
+        """ Compute the value of ``self.field_groups[name]``, see ``_get_field_groups``. """
         access_groups = self.model_groups
 
         field = self.model._fields.get(name)
@@ -184,28 +216,23 @@ class NameManager:
         elif field and field.groups:
             access_groups &= self.group_definitions.parse(field.groups, raise_if_not_found=False)
 
-        self.field_groups[name] = access_groups
         return access_groups
 
     def check(self, view):
         for name, use in self.used_names.items():
-            if (
-                name not in self.available_actions
-                and name not in self.available_names
-                and name not in self.model._fields
-                and name not in self.field_info
-            ):
+            if name in self.available_actions or name in self.available_names:
+                continue
+            if name not in self.model._fields and name not in self.field_info:
                 msg = _(
                     "Name or id “%(name_or_id)s” in %(use)s does not exist.",
                     name_or_id=name, use=use,
                 )
-                view._raise_view_error(msg)
-            if name not in self.available_actions and name not in self.available_names:
+            else:
                 msg = _(
                     "Name or id “%(name_or_id)s” in %(use)s must be present in view but is missing.",
                     name_or_id=name, use=use,
                 )
-                view._raise_view_error(msg)
+            view._raise_view_error(msg)
 
         for name in self.available_fields:
             if name not in self.model._fields and name not in self.field_info:
@@ -242,10 +269,10 @@ class NameManager:
                 view._log_view_warning(msg, node)
 
         for name, groups_uses in self.used_fields.items():
-            use, node = next(iter(groups_uses.values()))
             if name == 'id':  # always available
                 continue
             if "." in name:
+                use, _node = next(iter(groups_uses.values()))
                 msg = _(
                     "Invalid composed field %(definition)s in %(use)s",
                     definition=name, use=use,
@@ -258,6 +285,7 @@ class NameManager:
                     _logger.warning("Using Javascript syntax 'true, 'false' in expressions is deprecated, found %s", name)
                     continue
             elif info.get('select') == 'multi':  # mainly for searchpanel, but can be a generic behaviour.
+                use, _node = next(iter(groups_uses.values()))
                 msg = _(
                     "Field “%(name)s” used in %(use)s is present in view but is in select multi.",
                     name=name, use=use,
@@ -289,7 +317,7 @@ class NameManager:
                 model=self.model._name,
             ))
         else:
-            field_groups = self._get_field_groups(name)
+            field_groups = self.field_groups[name]
             debug.append(_(
                 "- field “%(name)s” is accessible for groups: %(field_groups)s",
                 name=name,
@@ -363,9 +391,11 @@ class NameManager:
         for name, groups_uses in self.used_fields.items():
             errors = []
             used = []
+            available_info = self.available_fields.get(name, {})
+            # the union of the groups of the field nodes, only if needed
+            available_combined_groups = None
 
             for used_groups, (use, node) in groups_uses.items():
-                available_info = self.available_fields.get(name, {})
                 # Access is restricted to the administrator only. There is no need to check
                 # groups as they are not used.
                 if used_groups.is_empty():
@@ -374,15 +404,15 @@ class NameManager:
                     continue
 
                 # No match possible using only access right and groups on the field.
-                if not (used_groups <= self._get_field_groups(name)):
+                if not (used_groups <= self.field_groups[name]):
                     errors.append((used_groups, use, node))
                     continue
 
                 # At least one field in view match match with the used combinations.
-                available_combined_groups = self.group_definitions.empty
-                nodes_groups = available_info.get('groups', [])
-                for groups in nodes_groups:
-                    available_combined_groups |= groups
+                if available_combined_groups is None:
+                    available_combined_groups = functools.reduce(
+                        operator.or_, available_info.get('groups', ()), self.group_definitions.empty,
+                    )
 
                 if not (used_groups <= available_combined_groups):
                     used.append((used_groups, use, node))
@@ -394,9 +424,9 @@ class NameManager:
             if not used:
                 continue
 
-            missing_groups = self.group_definitions.empty
-            for groups, _use, _node in used:
-                missing_groups |= groups
+            missing_groups = functools.reduce(
+                operator.or_, (groups for groups, _use, _node in used), self.group_definitions.empty,
+            )
 
             missing_fields[name] = (missing_groups, used)
 
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from inphms.orm import fields, api, models
+from inphms.orm.fields import Domain
 
 
 class ResBank(models.Model):
@@ -31,9 +32,9 @@ class ResBank(models.Model):
     @api.model
     def _search_display_name(self, operator, value):
         if operator in ('ilike', 'not ilike') and value:
-            domain = ['|', ('bic', '=ilike', value + '%'), ('name', 'ilike', value)]
+            domain = Domain('bic', '=ilike', value + '%') | Domain('name', 'ilike', value)
             if operator == 'not ilike':
-                domain = ['!', *domain]
+                domain = ~domain
             return domain
         return super()._search_display_name(operator, value)
 
@@ -3,11 +3,14 @@ import re
 
 from inphms.orm.fields import Domain
 from inphms import tools
-from inphms.tools import _
+from inphms.tools import frozendict, _
 from inphms.exceptions import UserError
 from .utils import FLAG_MAPPING, NO_FLAG_COUNTRIES
 from inphms.orm import models, api, fields
 
+# the field names of an address format, like "street" in "%(street)s"
+ADDRESS_FIELDS_REGEX = re.compile(r'\((.+?)\)')
+
 
 class ResCountry(models.Model):
     _name = 'res.country'
@@ -73,24 +76,34 @@ class ResCountry(models.Model):
         # first search by code
         if not operator in Domain.NEGATIVE_OPERATORS and name and len(name) == 2:
             countries = self.search_fetch(domain & Domain('code', operator, name), ['display_name'], limit=limit)
-            result.extend((country.id, country.display_name) for country in countries.sudo())
-            domain &= Domain('id', 'not in', countries.ids)
-            if limit is not None:
-                limit -= len(countries)
-                if limit <= 0:
-                    return result
+            if countries:
+                result.extend((country.id, country.display_name) for country in countries.sudo())
+                if limit is not None:
+                    limit -= len(countries)
+                    if limit <= 0:
+                        return result
+                domain &= Domain('id', 'not in', countries.ids)
         # normal search
         result.extend(super().name_search(name, domain, operator, limit))
         return result
 
     @api.model
-    @tools.ormcache('code', cache='stable')
     def _phone_code_for(self, code):
-        return self.search([('code', '=', code)]).phone_code
+        return self._phone_code_map().get(code, 0)
+
+    @api.model
+    @tools.ormcache(cache='stable')
+    def _phone_code_map(self):
+        """ Return the calling code of all countries, by country code. The map
+        does not depend on the context: it holds all countries, active or not,
+        whatever the user. """
+        countries = self.sudo().with_context(active_test=False).search_fetch([], ['code', 'phone_code'])
+        return frozendict((country.code, country.phone_code or 0) for country in countries)
 
     @api.model_create_multi
     def create(self, vals_list):
-        self.env.registry.clear_cache('stable')
+        if any(vals.get('code') or vals.get('phone_code') for vals in vals_list):
+            self.env.registry.clear_cache('stable')  # _phone_code_map
         for vals in vals_list:
             if vals.get('code'):
                 vals['code'] = vals['code'].upper()
@@ -100,9 +113,8 @@ class ResCountry(models.Model):
         if vals.get('code'):
             vals['code'] = vals['code'].upper()
         res = super().write(vals)
-        if ('code' in vals or 'phone_code' in vals):
-            # Intentionally simplified by not clearing the cache in create and unlink.
-            self.env.registry.clear_cache('stable')
+        if 'code' in vals or 'phone_code' in vals:
+            self.env.registry.clear_cache('stable')  # _phone_code_map
         if 'address_view_id' in vals or 'vat_label' in vals:
             # Changing the address view of the company must invalidate the view cached for res.partner
             # because of _view_get_address
@@ -112,21 +124,22 @@ class ResCountry(models.Model):
         return res
 
     def unlink(self):
-        self.env.registry.clear_cache('stable')
+        if self:
+            self.env.registry.clear_cache('stable')  # _phone_code_map
         return super().unlink()
 
     def get_address_fields(self):
         self.ensure_one()
-        return re.findall(r'\((.+?)\)', self.address_format)
+        return ADDRESS_FIELDS_REGEX.findall(self.address_format)
 
     @api.depends('code')
     def _compute_image_url(self):
         for country in self:
-            if not country.code or country.code in NO_FLAG_COUNTRIES:
+            code = country.code
+            if not code or code in NO_FLAG_COUNTRIES:
                 country.image_url = False
             else:
-                code = FLAG_MAPPING.get(country.code, country.code.lower())
-                country.image_url = "/base/static/img/country_flags/%s.png" % code
+                country.image_url = f"/base/static/img/country_flags/{FLAG_MAPPING.get(code) or code.lower()}.png"
 
     @api.constrains('address_format')
     def _check_address_format(self):
@@ -145,4 +158,4 @@ class ResCountry(models.Model):
         maintains a valid structure.
         '''
         for country in self:
-            country.country_group_codes = [g.code for g in country.country_group_ids if g.code] or ['']
+            country.country_group_codes = [code for code in country.country_group_ids.mapped('code') if code] or ['']
@@ -4,6 +4,9 @@ import re
 from inphms.orm import fields, models, api
 from inphms.orm.fields import Domain
 
+# a state name followed by its country name or code, like "Ohio (US)"
+NAME_COUNTRY_REGEX = re.compile(r"(?P<name>.+)\((?P<country>.+)\)")
+
 
 class ResCountryState(models.Model):
     _name = 'res.country.state'
@@ -62,7 +65,7 @@ class ResCountryState(models.Model):
         return domain
 
     def _get_name_search_domain(self, name, operator):
-        m = re.fullmatch(r"(?P<name>.+)\((?P<country>.+)\)", name)
+        m = NAME_COUNTRY_REGEX.fullmatch(name)
         if m:
             return Domain([
                 ('name', operator, m['name'].strip()),
@@ -15,7 +15,7 @@ FLAG_MAPPING = {
     "MF": "fr",
     "UM": "us",
 }
-NO_FLAG_COUNTRIES = [
+NO_FLAG_COUNTRIES = frozenset([
     "AQ", #Antarctica
     "SJ", #Svalbard + Jan Mayen : separate jurisdictions : no dedicated flag
-]
\ No newline at end of file
+])
\ No newline at end of file
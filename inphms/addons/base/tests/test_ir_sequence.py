@@ -6,6 +6,7 @@ from datetime import datetime
 import psycopg2
 import psycopg2.errors
 
+from inphms.databases import SQL
 from inphms.exceptions import UserError
 from inphms.modules import Registry, Environment
 from inphms.tests import common
@@ -274,3 +275,105 @@ class TestIrSequenceInit(common.TransactionCase):
         # Read the value of the current sequence
         n = seq.next_by_id()
         self.assertEqual(n, "0001", 'The actual sequence value must be 1. reading : %s' % n)
+
+
+class TestIrSequenceByCode(common.TransactionCase):
+
+    def test_next_by_code(self):
+        """ The sequence found by code follows its changes and the context. """
+        IrSequence = self.env['ir.sequence']
+        seq = IrSequence.create({
+            'name': 'test-sequence-by-code',
+            'code': 'test_sequence_by_code',
+            'implementation': 'no_gap',
+            'padding': 0,
+        })
+        self.assertEqual(IrSequence.next_by_code('test_sequence_by_code'), '1')
+
+        # archived sequences are only used with active_test=False
+        seq.active = False
+        self.assertFalse(IrSequence.next_by_code('test_sequence_by_code'))
+        self.assertEqual(IrSequence.with_context(active_test=False).next_by_code('test_sequence_by_code'), '2')
+
+        seq.active = True
+        self.assertEqual(IrSequence.next_by_code('test_sequence_by_code'), '3')
+
+        seq.code = 'test_sequence_by_code_2'
+        self.assertFalse(IrSequence.next_by_code('test_sequence_by_code'))
+        self.assertEqual(IrSequence.next_by_code('test_sequence_by_code_2'), '4')
+
+        seq.unlink()
+        self.assertFalse(IrSequence.next_by_code('test_sequence_by_code_2'))
+
+
+class TestIrSequenceNumberNextActual(common.TransactionCase):
+
+    def test_number_next_actual(self):
+        """ The next number shown follows the numbers drawn. """
+        for implementation in ('standard', 'no_gap'):
+            with self.subTest(implementation=implementation):
+                seq = self.env['ir.sequence'].create({
+                    'name': f'test-sequence-{implementation}',
+                    'implementation': implementation,
+                    'padding': 0,
+                })
+                self.assertEqual(seq.number_next_actual, 1)
+                self.assertEqual(seq.next_by_id(), '1')
+                self.assertEqual(seq.number_next_actual, 2)
+                self.assertEqual(seq.next_by_id(), '2')
+                self.assertEqual(seq.number_next_actual, 3)
+
+    def test_number_next_actual_date_range(self):
+        for implementation in ('standard', 'no_gap'):
+            with self.subTest(implementation=implementation):
+                seq = self.env['ir.sequence'].create({
+                    'name': f'test-sequence-date-range-{implementation}',
+                    'implementation': implementation,
+                    'use_date_range': True,
+                    'padding': 0,
+                })
+                self.assertEqual(seq.next_by_id(), '1')
+                date_range = seq.date_range_ids
+                self.assertEqual(date_range.number_next_actual, 2)
+                self.assertEqual(seq.next_by_id(), '2')
+                self.assertEqual(date_range.number_next_actual, 3)
+
+
+class TestIrSequencePrefetch(common.TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.seq = self.env['ir.sequence'].create({
+            'name': 'test-sequence-prefetch',
+            'implementation': 'standard',
+            'padding': 0,
+        })
+
+    def last_value(self):
+        """ Return the last value taken from the PostgreSQL sequence. """
+        [(value,)] = self.env.execute_query(SQL("SELECT last_value FROM %s", SQL.identifier(self.seq._pg_seqname)))
+        return value
+
+    def test_no_prefetch(self):
+        """ Each number is drawn from the PostgreSQL sequence. """
+        self.env['ir.config_parameter'].set_param('base.sequence_nextval_prefetch', 1)
+        for number in ('1', '2', '3'):
+            self.assertEqual(self.seq.next_by_id(), number)
+            self.assertEqual(self.last_value(), int(number))
+        self.assertFalse(self.env.cr.cache.get('ir_sequence_nextval', {}).get(self.seq._pg_seqname))
+
+    def test_prefetch(self):
+        """ The numbers are sequential, the ones not drawn with the cursor are
+        lost like the ones of a rolled back transaction. """
+        self.env['ir.config_parameter'].set_param('base.sequence_nextval_prefetch', 5)
+        self.assertEqual([self.seq.next_by_id() for _i in range(3)], ['1', '2', '3'])
+        self.assertEqual(self.last_value(), 5)
+
+        # a new cursor does not get the values prefetched by this one
+        self.env.cr.cache.pop('ir_sequence_nextval')
+        self.assertEqual(self.seq.next_by_id(), '6')
+        self.assertEqual(self.last_value(), 10)
+
+        # changing the sequence forgets the prefetched values
+        self.seq.number_next = 20
+        self.assertEqual(self.seq.next_by_id(), '20')
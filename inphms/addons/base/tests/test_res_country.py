@@ -1,6 +1,28 @@
 from inphms.tests import TransactionCase, tagged
 
 
+@tagged('-at_install', 'post_install')
+class TestResCountry(TransactionCase):
+    def test_phone_code_for(self):
+        Country = self.env['res.country']
+        country = Country.create({
+            'name': 'Arstotzka',
+            'code': 'AA',
+            'phone_code': 111,
+        })
+        self.assertEqual(Country._phone_code_for('AA'), 111)
+
+        country.phone_code = 222
+        self.assertEqual(Country._phone_code_for('AA'), 222)
+
+        country.code = 'AB'
+        self.assertEqual(Country._phone_code_for('AA'), 0)
+        self.assertEqual(Country._phone_code_for('AB'), 222)
+
+        # the lookup does not depend on the context
+        self.assertEqual(Country.with_context(active_test=True)._phone_code_for('AB'), 222)
+
+
 @tagged('-at_install', 'post_install')
 class TestResCountryState(TransactionCase):
     def test_find_by_name(self):
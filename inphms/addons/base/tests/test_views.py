@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import logging
 import re
+import tempfile
 import time
 from contextlib import contextmanager
 
@@ -1908,6 +1909,65 @@ class TestViews(ViewCase):
                     """,
         })
 
+    def test_onchange_spec(self):
+        arch = """
+            <form>
+                <field name="name" on_change="1"/>
+                <field name="child_ids">
+                    <field name="email"/>
+                    <list>
+                        <field name="name"/>
+                        <field name="parent_id"/>
+                    </list>
+                </field>
+            </form>
+        """
+        Partner = self.env['res.partner']
+        # a field directly inside a field is not part of its subviews
+        self.assertEqual(Partner._onchange_spec({'arch': arch}), {
+            'name': '1',
+            'child_ids': None,
+            'child_ids.name': None,
+            'child_ids.parent_id': None,
+        })
+        self.assertEqual(Partner._get_fields_spec({'arch': arch}), {
+            'name': {},
+            'child_ids': {'fields': {
+                'email': {},
+                'name': {},
+                # parent_id is the inverse field of child_ids
+            }},
+        })
+
+    def test_graph_pivot_view_fields(self):
+        """ The measures and groupbys available in graph and pivot views are
+        described with the fields of the view. """
+        graph = self.View.create({
+            'name': 'Test graph',
+            'model': 'ir.ui.view',
+            'arch': '<graph><field name="model" type="row"/></graph>',
+        })
+        pivot = self.View.create({
+            'name': 'Test pivot',
+            'model': 'ir.ui.view',
+            'arch': '<pivot><field name="name" type="row"/></pivot>',
+        })
+        result = self.View.get_views([(graph.id, 'graph'), (pivot.id, 'pivot')])
+        fields = result['models']['ir.ui.view']['fields']
+        # fields of the archs
+        self.assertIn('model', fields)
+        self.assertIn('name', fields)
+        # numeric fields, the measures of the graph
+        self.assertIn('priority', fields)
+        # groupable fields, the groupbys of the pivot
+        self.assertIn('type', fields)
+        self.assertIn('inherit_id', fields)
+
+        models = self.View._get_view_fields('graph', {'ir.ui.view': {'model'}})
+        self.assertLessEqual({'model', 'priority'}, models['ir.ui.view'])
+        models = self.View._get_view_fields('pivot', {'ir.ui.view': {'name'}})
+        self.assertLessEqual({'name', 'type', 'inherit_id'}, models['ir.ui.view'])
+
     def _insert_view(self, **kw):
         """Insert view into database via a query to passtrough validation"""
         kw.pop('id', None)
@@ -4652,6 +4712,26 @@ class TestXPathExtentions(common.BaseCase):
             1)
 
 
+class TestViewArchFromFile(common.BaseCase):
+    def test_namespaced_arch(self):
+        """ The namespaces declared in the data file are kept in the arch. """
+        with tempfile.NamedTemporaryFile('w', suffix='.xml') as data_file:
+            data_file.write("""<inphms xmlns:svg="http://www.w3.org/2000/svg">
+                <record id="dummy_view" model="ir.ui.view">
+                    <field name="arch" type="xml">
+                        <form><svg:svg><svg:circle r="1"/></svg:svg></form>
+                    </field>
+                </record>
+            </inphms>""")
+            data_file.flush()
+            arch = ir_ui_view.get_view_arch_from_file(data_file.name, 'base.dummy_view')
+
+        tree = etree.fromstring(arch)
+        self.assertEqual(tree.tag, 'form')
+        self.assertEqual(tree.nsmap.get('svg'), "http://www.w3.org/2000/svg")
+        self.assertEqual(len(tree.xpath('//svg:circle', namespaces=tree.nsmap)), 1)
+
+
 class TestQWebRender(ViewCase):
 
     def test_render(self):
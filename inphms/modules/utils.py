@@ -215,6 +215,7 @@ _CACHES_BY_KEY = {
     'templates': ('templates', 'templates.cached_values'),
     'routing': ('routing', 'routing.rewrites', 'templates.cached_values'),
     'groups': ('groups', 'templates', 'templates.cached_values'),  # The processing of groups is saved in the view
+    'sequences': ('sequences',),  # see ir.sequence
 }
 
 _REGISTRY_CACHES = {
@@ -226,6 +227,7 @@ _REGISTRY_CACHES = {
     'routing.rewrites': 8192,  # url_rewrite entries
     'templates.cached_values': 2048,  # arbitrary
     'groups': 8,  # see res.groups
+    'sequences': 512,  # see ir.sequence
 }
 
 
@@ -270,7 +270,7 @@ class Form:
             'fields_spec': fields_spec,
             'modifiers': modifiers,
             'contexts': contexts,
-            'onchange': model._onchange_spec({'arch': etree.tostring(tree)}),
+            'onchange': model._onchange_spec({'arch': tree}),
         }
 
     def _get_one2many_edition_view(self, field_info, node, level):